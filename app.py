@@ -1,11 +1,20 @@
+import codecs
 import io
 import os
 import re
+import tarfile
+import tempfile
+import time
 import zipfile
-from typing import Optional
+from typing import Optional, Tuple
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
 import streamlit as st
+import zstandard
+from charset_normalizer import from_bytes
+from pyarrow import csv as pacsv
 
 
 st.set_page_config(page_title="CSV → TXT 변환기", page_icon="🗂️", layout="centered")
@@ -14,49 +23,271 @@ st.title("CSV → TXT 변환기")
 st.write("CSV를 업로드하면 각 행의 텍스트를 개별 `.txt` 파일로 만들어 ZIP으로 다운로드할 수 있습니다.")
 st.caption("원본 동작 유지: 각 행에서 **첫 번째 문자열형 셀**을 텍스트로 사용하며, `filename` 컬럼이 있으면 파일명으로 사용합니다.")
 
+# 파일명 정리용 정규식은 한 번만 컴파일
+_CTRL_RE = re.compile(r"[\\/:\*\?\"<>\|\r\n\t]")
+_WS_RE = re.compile(r"\s+")
+# 값마다 str()을 적용하는 ufunc, 결과는 object 배열
+_to_str = np.frompyfunc(str, 1, 1)
+# pandas.read_csv의 기본 결측치 문자열 (pyarrow 기본값에는 "None", "<NA>"가 없음)
+_NA_VALUES = [
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+]
+
 uploaded = st.file_uploader("CSV 파일을 업로드하세요", type=["csv"])
 
-def read_csv_safely(file) -> Optional[pd.DataFrame]:
-    # 원본과 동일한 인코딩 시도: utf-8 → latin1
+def _csv_options(encoding: str, column_types: Optional[dict] = None) -> dict:
+    return {
+        # pyarrow의 멀티스레드 CSV 파서, 큰 블록 단위로 읽어 처리량을 높임
+        "read_options": pacsv.ReadOptions(encoding=encoding, block_size=8 << 20),
+        # 따옴표 안의 줄바꿈을 값으로 취급 (없으면 블록 경계에서 여러 줄 텍스트가 행으로 잘림)
+        "parse_options": pacsv.ParseOptions(newlines_in_values=True),
+        "convert_options": pacsv.ConvertOptions(
+            # pandas.read_csv처럼 빈 문자열/"NA" 등을 결측치로 취급
+            null_values=_NA_VALUES,
+            strings_can_be_null=True,
+            # pyarrow 기본값은 "1"/"0"도 bool로 보므로 pandas.read_csv의 bool 토큰만 사용
+            true_values=["True", "TRUE", "true"],
+            false_values=["False", "FALSE", "false"],
+            column_types=column_types,
+        ),
+    }
+
+def _read_csv_arrow(file, encoding: str) -> pd.DataFrame:
+    # 첫 블록만 읽어 추론된 스키마를 확인 (pyarrow도 첫 블록으로 열 타입을 정함)
+    schema = pacsv.open_csv(file, **_csv_options(encoding)).schema
+    file.seek(0)
+    # UTF-8로 해석되지 않는 값이 있으면 binary로 추론됨 → 원본처럼 latin1로 읽음
+    if any(pa.types.is_binary(field.type) for field in schema):
+        return _read_csv_arrow(file, "latin1")
+    # 날짜/시간은 pandas.read_csv처럼 문자열로 두고, 숫자는 pyarrow가 "0x1A"를 정수로, "+5"를 실수로 읽으므로
+    # 문자열로 읽은 뒤 pandas 규칙으로 변환
+    numeric = [i for i, field in enumerate(schema) if pa.types.is_integer(field.type) or pa.types.is_floating(field.type)]
+    as_text = {
+        field.name: pa.string()
+        for i, field in enumerate(schema)
+        if i in numeric or pa.types.is_temporal(field.type)
+    }
+    table = pacsv.read_csv(file, **_csv_options(encoding, as_text or None))
+    table = table.rename_columns(_dedupe_column_names(table.column_names))
+    # 문자열 열의 None을 pandas.read_csv와 같은 NaN으로 맞춤
+    df = table.to_pandas().fillna(np.nan)
+    for i in numeric:
+        try:
+            df.isetitem(i, pd.to_numeric(df.iloc[:, i]))
+        except (ValueError, TypeError):
+            # 숫자로 바뀌지 않는 값이 있으면 pandas.read_csv처럼 문자열 열로 둠
+            pass
+    return df
+
+def _dedupe_column_names(names: list) -> list:
+    # pandas.read_csv처럼 빈 열 이름은 "Unnamed: N"으로 바꾸고,
+    # 중복된 열 이름에 .1, .2 ... 를 붙임 (원래 헤더에 있는 이름은 건너뜀)
+    names = [name if name else f"Unnamed: {i}" for i, name in enumerate(names)]
+    header = set(names)
+    counts = {}
+    deduped = []
+    for name in names:
+        base = name
+        count = counts.get(base, 0)
+        while count > 0:
+            counts[base] = count + 1
+            name = f"{base}.{count}"
+            count = count + 1 if name in header else counts.get(name, 0)
+        deduped.append(name)
+        counts[name] = count + 1
+    return deduped
+
+def detect_encoding(file, sample_size: int = 64 * 1024) -> str:
+    # 앞부분만 읽어 인코딩을 추정 (전체 파일을 인코딩별로 여러 번 파싱하지 않음)
+    head = file.read(sample_size)
+    file.seek(0)
+    try:
+        # 잘린 마지막 문자는 허용하고 UTF-8인지 먼저 확인
+        codecs.getincrementaldecoder("utf-8")().decode(head, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        pass
+    # 후보를 한국어(cp949 ⊃ euc-kr)와 원본의 대체 인코딩(latin1)으로 한정해 오탐을 줄임
+    best = from_bytes(head, cp_isolation=["cp949", "latin_1"]).best()
+    return best.encoding if best else "latin1"
+
+# 업로드마다 DataFrame이 서버 메모리에 남으므로 최근 몇 개만, 1시간까지만 보관
+@st.cache_data(show_spinner=False, max_entries=4, ttl=3600)
+def parse_csv(csv_bytes: bytes) -> pd.DataFrame:
+    # 위젯 조작으로 스크립트가 다시 실행돼도 같은 업로드는 다시 파싱하지 않음
+    file = io.BytesIO(csv_bytes)
+    encoding = detect_encoding(file)
     try:
         try:
-            return pd.read_csv(file, encoding="utf-8")
+            return _read_csv_arrow(file, encoding)
+        except UnicodeDecodeError:
+            # 앞부분 이후에 추정한 인코딩(cp949 등)으로 해석되지 않는 바이트가 있으면 원본처럼 latin1로 재시도
+            encoding = "latin1"
+            file.seek(0)
+            return _read_csv_arrow(file, encoding)
+    except pa.ArrowInvalid:
+        # 열 수가 모자란 행 등 pyarrow가 거부하는 CSV는 원본처럼 pandas로 읽음
+        file.seek(0)
+        try:
+            return pd.read_csv(file, encoding=encoding)
         except UnicodeDecodeError:
             file.seek(0)
             return pd.read_csv(file, encoding="latin1")
+
+def read_csv_safely(file) -> Optional[pd.DataFrame]:
+    try:
+        return parse_csv(file.getvalue())
     except Exception as e:
         st.error(f"CSV 파일을 읽는 중 오류가 발생했습니다:\n{e}")
         return None
 
-def sanitize_filename(name: str) -> str:
-    # 파일명에서 위험/부적절 문자 제거
-    name = str(name)
-    name = name.strip()
+def sanitize_filenames(names: pd.Series) -> np.ndarray:
+    # 파일명 열 전체에서 위험/부적절 문자를 한 번에 제거
+    names = names.str.strip()
     # 경로 구분자, 제어문자 제거
-    name = re.sub(r"[\\/:\*\?\"<>\|\r\n\t]", "_", name)
+    names = names.str.replace(_CTRL_RE, "_", regex=True)
     # 공백 압축
-    name = re.sub(r"\s+", " ", name)
+    names = names.str.replace(_WS_RE, " ", regex=True)
     # 빈 값 보호
-    return name if name else "untitled"
+    return names.mask(names == "", "untitled").to_numpy(dtype=object)
 
-def first_string_cell(row) -> Optional[str]:
-    for val in row:
-        if isinstance(val, str) and val.strip():
-            return val
-    return None
+def first_string_cells(df: pd.DataFrame) -> np.ndarray:
+    # 각 행의 첫 번째 (공백이 아닌) 문자열 셀, 없으면 NaN
+    text_arr = np.full(len(df), np.nan, dtype=object)
+    missing = np.ones(len(df), dtype=bool)
+    obj = df.select_dtypes(include=["object", "string"])
+    # 대부분 첫 문자열 열에서 끝나므로, 이후 열은 아직 텍스트가 없는 행만 확인
+    for j in range(obj.shape[1]):
+        rows = np.flatnonzero(missing)
+        if rows.size == 0:
+            break
+        col = obj.iloc[rows, j]
+        try:
+            # 문자열이 아니거나 공백뿐인 셀은 건너뜀
+            ok = (col.str.strip().str.len() > 0).to_numpy(dtype=bool, na_value=False)
+        except AttributeError:
+            # 문자열 값이 하나도 없는 object 열
+            continue
+        text_arr[rows[ok]] = col.to_numpy(dtype=object)[ok]
+        missing[rows[ok]] = False
+    return text_arr
 
-def ensure_unique(name: str, used: set) -> str:
-    base, ext = os.path.splitext(name)
-    if name not in used:
-        used.add(name)
+def ensure_unique(name: str, used: dict) -> str:
+    # used: 지금까지 쓴 파일명 → 중복 시 다음에 시도할 번호
+    i = used.get(name)
+    if i is None:
+        # 대부분의 이름은 중복되지 않으므로 조회 한 번, 기록 한 번으로 끝냄
+        used[name] = 2
         return name
-    i = 2
-    while True:
-        candidate = f"{base}_{i}{ext}"
-        if candidate not in used:
-            used.add(candidate)
-            return candidate
+    base, ext = os.path.splitext(name)
+    candidate = f"{base}_{i}{ext}"
+    while candidate in used:
         i += 1
+        candidate = f"{base}_{i}{ext}"
+    used[name] = i + 1
+    used[candidate] = 2
+    return candidate
+
+def iter_entries(name_arr, text_arr):
+    # (파일명, UTF-8 바이트) 쌍을 차례로 생성, 텍스트가 없는 행은 건너뜀
+    keep = [isinstance(text_value, str) for text_value in text_arr]
+    names = [file_name for file_name, k in zip(name_arr, keep) if k]
+    # 중복 여부는 set 생성(C 수준)으로 확인하고, 중복이 있을 때만 행 단위 처리
+    if len(set(names)) != len(names):
+        used_names = {}
+        names = [ensure_unique(file_name, used_names) for file_name in names]
+    # 인코딩은 기록 직전에 한 항목씩 수행 (전체를 미리 인코딩해 두면 텍스트 사본이 메모리에 한 벌 더 쌓임)
+    texts = (text_value for text_value, k in zip(text_arr, keep) if k)
+    for file_name, text_value in zip(names, texts):
+        yield file_name, text_value.encode("utf-8")
+
+def _zip_kwargs(compress_level: int) -> dict:
+    if compress_level == 0:
+        return {"compression": zipfile.ZIP_STORED}
+    return {"compression": zipfile.ZIP_DEFLATED, "compresslevel": compress_level}
+
+def _zip_info(zf: zipfile.ZipFile, file_name: str, date_time) -> zipfile.ZipInfo:
+    # writestr과 같은 메타데이터로 ZipInfo를 만듦
+    info = zipfile.ZipInfo(file_name, date_time=date_time)
+    info.compress_type = zf.compression
+    # ZipInfo는 Python 3.13부터 압축 레벨을 공개 속성 compress_level로, 그 이전에는 _compresslevel로 가짐
+    if hasattr(info, "compress_level"):
+        info.compress_level = zf.compresslevel
+    else:
+        info._compresslevel = zf.compresslevel
+    info.external_attr = 0o600 << 16
+    return info
+
+def write_zip(buffer, entries, compress_level: int) -> int:
+    date_time = time.localtime(time.time())[:6]
+    created = 0
+    with zipfile.ZipFile(buffer, "w", **_zip_kwargs(compress_level)) as zf:
+        for file_name, data in entries:
+            # 이미 인코딩된 바이트를 바로 기록
+            info = _zip_info(zf, file_name, date_time)
+            with zf.open(info, "w", force_zip64=len(data) > zipfile.ZIP64_LIMIT) as fp:
+                fp.write(data)
+            created += 1
+    return created
+
+def write_combined_zip(buffer, entries, compress_level: int) -> int:
+    # 모든 텍스트를 구분선과 함께 하나의 .txt 항목에 기록 → 압축기 초기화가 한 번뿐이라 작은 행이 많을 때 유리
+    created = 0
+    with zipfile.ZipFile(buffer, "w", **_zip_kwargs(compress_level)) as zf:
+        info = _zip_info(zf, "converted_texts.txt", time.localtime(time.time())[:6])
+        with zf.open(info, "w", force_zip64=True) as fp:
+            for file_name, data in entries:
+                fp.write(f"---FILE:{file_name}---\n".encode("utf-8"))
+                fp.write(data)
+                fp.write(b"\n")
+                created += 1
+    return created
+
+def write_tar_zst(buffer, entries) -> int:
+    # zstd 레벨 3: deflate-6과 비슷하거나 나은 압축률을 훨씬 적은 CPU로 얻음, threads=-1은 모든 코어 사용
+    cctx = zstandard.ZstdCompressor(level=3, threads=-1)
+    mtime = int(time.time())
+    created = 0
+    with cctx.stream_writer(buffer, closefd=False) as zst:
+        with tarfile.open(fileobj=zst, mode="w|") as tf:
+            for file_name, data in entries:
+                info = tarfile.TarInfo(name=file_name)
+                info.size = len(data)
+                info.mtime = mtime
+                tf.addfile(info, io.BytesIO(data))
+                created += 1
+    return created
+
+# 압축 결과(bytes) 전체가 캐시되므로 최근 몇 개만, 1시간까지만 보관
+@st.cache_data(show_spinner=False, max_entries=4, ttl=3600)
+def build_archive(csv_bytes: bytes, filename_col: Optional[str], archive_format: str, compress_level: int) -> Tuple[bytes, int]:
+    # 같은 업로드·설정으로 다시 누르면 압축을 다시 하지 않고 캐시된 결과를 반환
+    df = parse_csv(csv_bytes)
+    # 64MB까지는 메모리에서, 그보다 커지면 임시 파일로 넘겨 압축 파일을 생성
+    with tempfile.SpooledTemporaryFile(max_size=64 * 1024 * 1024) as buffer:
+        # 행 단위 iterrows 대신 열 단위로 미리 배열을 만들어 둠
+        text_arr = first_string_cells(df)
+        if filename_col:
+            # 파일명 열을 object 배열 그대로 ufunc로 한 번에 문자열화
+            # (astype(str)의 고정 폭 <U 배열은 모든 행을 가장 긴 이름 길이로 채워 메모리를 크게 씀)
+            raw_names = _to_str(df[filename_col].to_numpy(dtype=object)) + ".txt"
+            name_arr = sanitize_filenames(pd.Series(raw_names))
+        else:
+            name_arr = np.char.add(np.char.add("row_", (np.arange(len(df)) + 1).astype(str)), ".txt")
+
+        entries = iter_entries(name_arr, text_arr)
+        if archive_format == "ZIP":
+            created = write_zip(buffer, entries, compress_level)
+        elif archive_format == "단일 TXT (ZIP)":
+            created = write_combined_zip(buffer, entries, compress_level)
+        else:
+            created = write_tar_zst(buffer, entries)
+
+        buffer.seek(0)
+        # st.download_button은 SpooledTemporaryFile을 직접 받지 않으므로 바이트로 반환
+        # (이때 압축 파일 전체가 메모리에 올라오므로, 스풀은 생성 중의 메모리만 제한함)
+        return buffer.read(), created
 
 if uploaded is not None:
     df = read_csv_safely(uploaded)
@@ -65,6 +296,10 @@ if uploaded is not None:
         st.success("CSV 파일을 정상적으로 불러왔습니다.")
         st.write(f"열(컬럼) 수: **{len(df.columns)}**, 행 수: **{len(df)}**")
 
+        # 넓은 CSV는 미리보기 전송 비용이 크므로 필요할 때만, 앞 20행 × 20열까지만 표시
+        if st.checkbox("미리보기 표시", value=False):
+            st.dataframe(df.iloc[:20, :20])
+
         # filename 컬럼 존재 여부 확인(대소문자 무시)
         filename_col = None
         for col in df.columns:
@@ -72,36 +307,28 @@ if uploaded is not None:
                 filename_col = col
                 break
 
+        compress_level = 0
+        archive_format = st.radio("압축 형식", ["ZIP", "TAR.ZST", "단일 TXT (ZIP)"], horizontal=True)
+        if archive_format != "TAR.ZST":
+            # 텍스트 위주 ZIP은 레벨 1에서도 압축률 차이가 작고 훨씬 빠름 (0 = 무압축)
+            compress_level = st.select_slider("압축 레벨", options=[0, 1, 3, 6, 9], value=1)
+
         if st.button("변환 시작"):
-            # ZIP을 메모리에서 생성
-            buffer = io.BytesIO()
-            used_names = set()
-            created = 0
-            with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as zf:
-                for i, row in df.iterrows():
-                    text_value = first_string_cell(row)
-                    if text_value is None:
-                        continue
-
-                    if filename_col:
-                        raw_name = f"{row[filename_col]}.txt"
-                    else:
-                        raw_name = f"row_{i+1}.txt"
-
-                    file_name = sanitize_filename(raw_name)
-                    file_name = ensure_unique(file_name, used_names)
-
-                    zf.writestr(file_name, text_value)
-                    created += 1
-
-            buffer.seek(0)
-
-            st.success(f"✅ 변환 완료! 원본과 동일하게 총 {len(df)}개의 행을 처리했으며, 실제 텍스트 파일 {created}개가 생성되었습니다.")
+            archive_bytes, created = build_archive(uploaded.getvalue(), filename_col, archive_format, compress_level)
+            if archive_format == "TAR.ZST":
+                download_name, mime = "converted_texts.tar.zst", "application/zstd"
+            else:
+                download_name, mime = "converted_texts.zip", "application/zip"
+
+            if archive_format == "단일 TXT (ZIP)":
+                st.success(f"✅ 변환 완료! 총 {len(df)}개의 행을 처리했으며, {created}개 행의 텍스트를 하나의 텍스트 파일(converted_texts.txt)로 합쳤습니다.")
+            else:
+                st.success(f"✅ 변환 완료! 원본과 동일하게 총 {len(df)}개의 행을 처리했으며, 실제 텍스트 파일 {created}개가 생성되었습니다.")
             st.download_button(
-                label="ZIP 다운로드",
-                data=buffer,
-                file_name="converted_texts.zip",
-                mime="application/zip",
+                label=f"{archive_format} 다운로드",
+                data=archive_bytes,
+                file_name=download_name,
+                mime=mime,
             )
 
             if created == 0: